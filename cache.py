@@ -0,0 +1,146 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from cachetools import TTLCache
+from typing import Optional, TypeVar
+import models
+import time
+
+# Кэш горячих чтений без связей: (таблица, ключ...) -> {колонка: значение}.
+# Данные могут отставать от бд максимум на ttl секунд. Менять кэш можно только по итогам
+# закоммиченной транзакции: до коммита строки копятся в session.info, при откате выбрасываются
+CACHE_TTL = 30
+
+ModelT = TypeVar('ModelT', bound=models.Base)
+
+_query_cache: TTLCache = TTLCache(maxsize=4096, ttl=CACHE_TTL)
+# (таблица, id) -> ключи этой строки в _query_cache (по id, по email...), чтобы сбрасывать их без перебора кэша
+_cache_index: TTLCache = TTLCache(maxsize=4096, ttl=CACHE_TTL)
+# (таблица, id) -> когда закоммитили изменение строки: чужое чтение, начатое раньше, в кэш уже не кладем
+_cache_changed_at: TTLCache = TTLCache(maxsize=16384, ttl=CACHE_TTL)
+
+
+def _pending(db: AsyncSession) -> tuple[dict[tuple, tuple], set[tuple]]:
+    """
+    Отложенные изменения кэша текущей транзакции: что положить и какие строки сбросить после коммита
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+
+    Returns:
+        tuple[dict[tuple, tuple], set[tuple]]: (ключ -> ((таблица, id), колонки), {(таблица, id)})
+    """
+    info = db.sync_session.info
+    return info.setdefault('cache_puts', {}), info.setdefault('cache_drops', set())
+
+
+def is_cached(key: tuple) -> bool:
+    """Есть ли ключ в общем кэше (уже после коммита)"""
+    return key in _query_cache
+
+
+def cache_put(db: AsyncSession, key: tuple, obj: Optional[models.Base]) -> None:
+    """
+    Запоминаем загруженные колонки объекта (сам объект привязан к сессии, его хранить нельзя).
+    В кэш они попадут только после коммита транзакции
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        key (tuple): Ключ вида (таблица, ...)
+        obj (Optional[models.Base]): Объект из бд, None не кэшируем
+    """
+    if obj is None:
+        return
+    state = inspect(obj)
+    row = {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+    puts, _ = _pending(db)
+    puts[key] = ((key[0], row['id']), row)
+
+
+async def cache_get(db: AsyncSession, model: type[ModelT], key: tuple) -> Optional[ModelT]:
+    """
+    Собираем объект из кэша и подключаем к сессии через merge(load=False) - без запроса в бд.
+    Строки, которые эта транзакция уже меняла, из кэша не берем: там еще старая версия
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        model (type[ModelT]): Модель объекта
+        key (tuple): Ключ вида (таблица, ...)
+
+    Returns:
+        Optional[ModelT]: Объект, привязанный к db, либо None при промахе
+    """
+    row = _query_cache.get(key)
+    if row is None:
+        return None
+    _, drops = _pending(db)
+    if (key[0], row['id']) in drops:
+        return None
+    own = db.sync_session.identity_map.get(identity_key(model, row['id']))
+    if own is not None:
+        return own # объект уже в сессии и он не старее кэша, merge перезаписал бы его
+    obj = model.__mapper__.class_manager.new_instance()
+    for attr_key, value in row.items():
+        set_committed_value(obj, attr_key, value)
+    make_transient_to_detached(obj)
+    return await db.merge(obj, load=False)
+
+
+def cache_invalidate(db: AsyncSession, table: str, obj_id: int) -> None:
+    """
+    Помечаем строку измененной: после коммита все ее записи (и по id, и по email) уйдут из кэша,
+    а до коммита эта сессия читает ее мимо кэша
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        table (str): Имя таблицы
+        obj_id (int): ID объекта
+    """
+    puts, drops = _pending(db)
+    drops.add((table, obj_id))
+    for key in [key for key, (row_key, _) in puts.items() if row_key == (table, obj_id)]:
+        del puts[key]
+
+
+@event.listens_for(Session, 'after_begin')
+def _mark_begin(session, transaction, connection):
+    # с этого момента транзакция может видеть строки, которые другие потом изменят
+    session.info.setdefault('cache_started', time.monotonic())
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply(session):
+    puts = session.info.pop('cache_puts', {})
+    drops = session.info.pop('cache_drops', set())
+    started = session.info.pop('cache_started', None)
+    now = time.monotonic()
+    for row_key in drops:
+        _cache_changed_at[row_key] = now
+        for key in _cache_index.pop(row_key, ()):
+            _query_cache.pop(key, None)
+    if started is None or now - started >= CACHE_TTL:
+        return # отметки об изменениях старше ttl уже забыты, проверить прочитанное нечем
+    for key, (row_key, row) in puts.items():
+        if _cache_changed_at.get(row_key, started) > started:
+            continue # строку изменили после начала нашей транзакции, прочитанное могло устареть
+        _query_cache[key] = row
+        _cache_index[row_key] = _cache_index.get(row_key, frozenset()) | {key}
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_puts(session):
+    # откат (в том числе до savepoint): прочитанное могло быть несохраненными изменениями
+    session.info.pop('cache_puts', None)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_all(session, previous_transaction):
+    if previous_transaction.parent is None: # откатили всю транзакцию, в бд ничего не поменялось
+        for name in ('cache_puts', 'cache_drops', 'cache_started'):
+            session.info.pop(name, None)
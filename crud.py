@@ -1,61 +1,258 @@
 import models
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, insert, func, and_, any_, bindparam, ARRAY, BigInteger
 from decorator import exception_decorator
-from typing import Sequence, Optional
+from cache import cache_get, cache_put, cache_invalidate
+from typing import Sequence, Optional, Iterator, AsyncIterator, Any, NamedTuple, Callable
 from datetime import date
-from sqlalchemy.orm import selectinload
+from contextlib import aclosing
+from sqlalchemy.orm import selectinload, joinedload, contains_eager, undefer_group, Load
+from sqlalchemy.orm.attributes import set_committed_value
 
 
+def _chunked(rows: Sequence[dict[str, Any]], size: int = models.BULK_BATCH_SIZE) -> Iterator[Sequence[dict[str, Any]]]:
+    """
+    Режем строки на пачки, чтобы не собирать в памяти один огромный INSERT
+
+    Args:
+        rows (Sequence[dict[str, Any]]): Строки для вставки
+        size (int, optional): Размер пачки. Defaults to models.BULK_BATCH_SIZE.
+
+    Yields:
+        Sequence[dict[str, Any]]: Очередная пачка строк
+    """
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+async def _bulk_insert(db: AsyncSession, model: type[models.Base], rows: Sequence[dict[str, Any]]) -> list[int]:
+    """
+    Массовая вставка: на каждую пачку один INSERT ... VALUES (...), (...) RETURNING id
+    вместо add/flush/refresh на каждую строку
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        model (type[models.Base]): Модель, в таблицу которой вставляем
+        rows (Sequence[dict[str, Any]]): Строки в виде словарей {колонка: значение}
+
+    Returns:
+        list[int]: ID созданных записей в том же порядке, что и rows
+    """
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    ids: list[int] = []
+    for chunk in _chunked(rows):
+        result = await db.execute(stmt, [_validated(model, row) for row in chunk])
+        ids.extend(result.scalars().all())
+    return ids
+
+
+def _ids_array(ids: Sequence[int]):
+    """
+    Список ID одним параметром-массивом: WHERE id = ANY(:ids).
+    Текст запроса не зависит от длины списка (в отличие от IN (...)),
+    поэтому подготовленный запрос переиспользуется
+
+    Args:
+        ids (Sequence[int]): Список ID
+
+    Returns:
+        Выражение ANY(:ids) для сравнения с колонкой
+    """
+    return any_(bindparam('ids', list(ids), type_=ARRAY(BigInteger), unique=True))
+
+
+async def _stream(db: AsyncSession, stmt, batch: int) -> AsyncIterator[Any]:
+    """
+    Отдаем объекты запроса потоком: серверный курсор отдает по batch строк,
+    и в памяти лежит только одна пачка, а не весь результат сразу.
+    Вызывать через contextlib.aclosing, чтобы курсор закрывался и при раннем выходе из цикла
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        stmt: SELECT по одной модели
+        batch (int): Сколько строк забирать с сервера за раз
+
+    Yields:
+        Any: Очередной объект модели
+    """
+    result = await db.stream(statement=stmt.execution_options(yield_per=batch))
+    try:
+        async for obj in result.scalars():
+            yield obj
+    finally:
+        await result.close() # если перестали читать раньше, закрываем курсор сразу
+
+
+# insert()/update() не вызывают @validates моделей, поэтому те же проверки зовем сами
+_VALIDATORS: dict[type[models.Base], dict[str, Callable[[Any], Any]]] = {
+    models.Book: {'isbn': models.validate_isbn, 'published_year': models.validate_published_year},
+    models.Reader: {'email': models.validate_email, 'phone': models.validate_phone},
+}
+
+
+def _validated(model: type[models.Base], values: dict[str, Any]) -> dict[str, Any]:
+    """
+    Прогоняем значения через проверки модели (как при создании объекта ORM)
+
+    Args:
+        model (type[models.Base]): Модель, в таблицу которой пишем
+        values (dict[str, Any]): Значения {колонка: значение}
+
+    Returns:
+        dict[str, Any]: Проверенные и нормализованные значения (пустой phone -> None)
+    """
+    checks = _VALIDATORS.get(model)
+    if not checks:
+        return values
+    return {key: checks[key](value) if key in checks else value for key, value in values.items()}
 
 
 """------- AUTHOR ------"""
 @exception_decorator
-async def get_author_by_id(db: AsyncSession, author_id: int) -> Optional[models.Author]:
+async def get_author_by_id(db: AsyncSession, author_id: int, with_books: bool = True) -> Optional[models.Author]:
     """
-    Получить автора по ID с предзагрузкой книг
+    Получить автора по ID с предзагрузкой книг.
+    Без книг (with_books=False) автор берется из кэша
 
     Args:
         db (AsyncSession): Асинхронная сессия SQLalchemy
         author_id (int): ID автора
+        with_books (bool, optional): Предзагрузить книги. Defaults to True.
 
     Returns:
         Optional[models.Author] (объект Автора или None, если не нашли)
     """
+    if not with_books:
+        key = ('author', author_id)
+        author = await cache_get(db, models.Author, key)
+        if author is None:
+            author = await db.get(models.Author, author_id, options=[undefer_group('details')])
+            cache_put(db, key, author)
+        return author
+
     stmt = (
         select(models.Author)
         .where(models.Author.id == author_id)
+        .options(
+            joinedload(models.Author.books), # один запрос с JOIN вместо второго SELECT
+            undefer_group('details') # для одной записи отдаем и bio
+        )
+        )
+    result = await db.execute(statement=stmt)
+    return result.unique().scalar_one_or_none()
+
+
+@exception_decorator
+async def get_authors_by_ids(db: AsyncSession, ids: Sequence[int]) -> dict[int, models.Author]:
+    """
+    Получить сразу несколько авторов по списку ID одним запросом.
+    Вместо цикла по get_author_by_id (N запросов, классический N+1) - один WHERE id = ANY(:ids)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        ids (Sequence[int]): Список ID
+
+    Returns:
+        dict[int, models.Author]: Словарь ID -> объект Author, ненайденных ID в нем нет
+    """
+    if not ids:
+        return {}
+    stmt = (
+        select(models.Author)
+        .where(models.Author.id == _ids_array(ids))
         .options(
             selectinload(models.Author.books)
         )
+    )
+    result = await db.execute(statement=stmt)
+    return {author.id: author for author in result.scalars()}
+
+
+@exception_decorator
+async def get_author_with_books(db: AsyncSession, author_id: int) -> Optional[tuple[models.Author, list[models.Book]]]:
+    """
+    Получить автора и его книги одним запросом (JOIN), вместо
+    get_author_by_id + get_books_by_author
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        author_id (int): ID автора
+
+    Returns:
+        Optional[tuple[models.Author, list[models.Book]]]: (автор, его книги), либо None
+    """
+    stmt = (
+        select(models.Author)
+        .where(models.Author.id == author_id)
+        .options(
+            joinedload(models.Author.books),
+            undefer_group('details')
         )
+    )
     result = await db.execute(statement=stmt)
-    return result.scalar_one_or_none()
+    author = result.unique().scalar_one_or_none()
+    if author is None:
+        return None
+    return author, list(author.books)
 
 
 @exception_decorator
-async def get_all_authors(db: AsyncSession, skip: int=0, limit: int=100) -> Sequence[models.Author]:
+async def get_all_authors(
+    db: AsyncSession,
+    after_id: Optional[int] = None,
+    limit: int = 100
+    ) -> tuple[Sequence[models.Author], Optional[int]]:
     """
-    Получить всех авторов подряд, можно указать сколько пропустить и сколько надо получить
+    Получить авторов постранично по ключу (keyset): страница начинается сразу после after_id,
+    поэтому дальние страницы стоят столько же, сколько первая (в отличие от OFFSET)
 
     Args:
         db (AsyncSession): Активная сессия SQLalchemy
-        skip (int, optional): Сколько пропускаем от начала (OFFSET). Defaults to 0.
+        after_id (Optional[int], optional): ID последнего автора с прошлой страницы. Defaults to None (с начала).
         limit (int, optional): Сколько нужно вывести. Defaults to 100.
 
     Returns:
-        Sequence[models.Author]: Набор объектов Author
+        tuple[Sequence[models.Author], Optional[int]]: Набор объектов Author и after_id для следующей страницы (None, если авторов больше нет)
     """
     stmt = (
         select(models.Author)
-        .offset(skip)
+        .order_by(models.Author.id)
         .limit(limit)
         .options(
             selectinload(models.Author.books)
         )
-        )
+    )
+    if after_id is not None:
+        stmt = stmt.where(models.Author.id > after_id)
     result = await db.execute(statement=stmt)
-    return result.scalars().all()
+    authors = result.scalars().all()
+    return authors, (authors[-1].id if authors and len(authors) == limit else None) # неполная страница - последняя
+
+
+@exception_decorator
+async def iter_all_authors(db: AsyncSession, batch: int = 500) -> AsyncIterator[models.Author]:
+    """
+    Пройти по всем авторам потоком: серверный курсор отдает по batch строк,
+    и в памяти лежит только одна пачка, а не весь результат сразу.
+    Больше batch - меньше походов в бд, но больше памяти; 500 - разумная середина
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        batch (int, optional): Сколько строк забирать с сервера за раз. Defaults to 500.
+
+    Yields:
+        models.Author: Очередной автор (с книгами)
+    """
+    stmt = (
+        select(models.Author)
+        .order_by(models.Author.id)
+        .options(
+            selectinload(models.Author.books)
+        )
+    )
+    async with aclosing(_stream(db, stmt, batch)) as authors:
+        async for author in authors:
+            yield author
 
 
     
@@ -80,22 +277,63 @@ async def create_author(
         
     """
     
-    author = models.Author(
-        name = name,
-        bio = bio,
-        birth_date = birth_date
+    stmt = (
+        insert(models.Author)
+        .values(
+            name = name,
+            bio = bio,
+            birth_date = birth_date
+        )
+        .returning(models.Author) # сразу получаем строку с id и created_at, без refresh
+        .options(undefer_group('details')) # без этого bio не попадет в объект
     )
-    db.add(author)
-    await db.flush() #отправляем в базу
-    await db.refresh(author)
-    return author
+    result = await db.execute(statement=stmt)
+    return result.scalar_one()
+
+
+@exception_decorator
+async def bulk_create_authors(db: AsyncSession, rows: Sequence[dict[str, Any]]) -> list[int]:
+    """
+    Создать много авторов разом (для наполнения/импорта)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        rows (Sequence[dict[str, Any]]): Словари с полями name, bio, birth_date
+
+    Returns:
+        list[int]: ID созданных авторов в порядке rows
+    """
+    return await _bulk_insert(db, models.Author, rows)
 
 
 
 @exception_decorator
-async def update_author(db: AsyncSession, author_id: int,  **kwargs) -> Optional[models.Author]:
+async def update_author(db: AsyncSession, author_id: int, **kwargs) -> bool:
     """
-    Изменяем указанные поля у Author с определенным ID
+    Изменяем указанные поля у Author с определенным ID, саму строку не возвращаем
+    (если измененный объект нужен - update_author_returning)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        author_id (int): ID автора
+
+    Returns:
+        bool: True, если автор найден и изменен, False в противном случае
+    """
+    stmt = (
+        update(models.Author)
+        .where(models.Author.id == author_id)
+        .values(kwargs)
+    )
+    result = await db.execute(statement=stmt)
+    cache_invalidate(db, 'author', author_id)
+    return result.rowcount > 0
+
+
+@exception_decorator
+async def update_author_returning(db: AsyncSession, author_id: int,  **kwargs) -> Optional[models.Author]:
+    """
+    Изменяем указанные поля у Author с определенным ID и возвращаем измененный объект
 
     Args:
         db (AsyncSession): Активная сессия SQLalchemy
@@ -109,10 +347,10 @@ async def update_author(db: AsyncSession, author_id: int,  **kwargs) -> Optional
         .where(models.Author.id == author_id)
         .values(kwargs)
         .returning(models.Author)
-        
-            
+        .options(undefer_group('details'))
             )
     author = await db.execute(statement=stmt)
+    cache_invalidate(db, 'author', author_id)
     return author.scalar_one_or_none()
 
 
@@ -136,6 +374,7 @@ async def delete_author(db: AsyncSession, author_id: int) -> bool:
     )
     
     result = await db.execute(stmt)
+    cache_invalidate(db, 'author', author_id)
     return result.rowcount > 0
 
 
@@ -143,53 +382,158 @@ async def delete_author(db: AsyncSession, author_id: int) -> bool:
 """-----BOOK-----"""
 
 @exception_decorator
-async def get_book_by_id(db: AsyncSession, book_id: int) -> Optional[models.Book]:
+async def get_book_by_id(db: AsyncSession, book_id: int, with_relations: bool = True) -> Optional[models.Book]:
     """
-    Получить книгу по заданному ID
+    Получить книгу по заданному ID.
+    Без автора и выдач (with_relations=False) книга берется из кэша
 
     Args:
         db (AsyncSession): Активная сессия SQLaclhemy
         book_id (int): ID книги, которую хотим получить
+        with_relations (bool, optional): Предзагрузить автора и выдачи. Defaults to True.
 
     Returns:
         Optional[models.Book]: Объект Book, либо None
     """
+    if not with_relations:
+        key = ('book', book_id)
+        book = await cache_get(db, models.Book, key)
+        if book is None:
+            book = await db.get(models.Book, book_id, options=[undefer_group('details')])
+            cache_put(db, key, book)
+        return book
+
     stmt = (
         select(models.Book)
         .where(models.Book.id == book_id)
+        .options(
+            joinedload(models.Book.author),
+            joinedload(models.Book.loans),
+            undefer_group('details')
+        )
+    )
+    book = await db.execute(statement=stmt)
+    return book.unique().scalar_one_or_none()
+
+
+@exception_decorator
+async def get_books_by_ids(db: AsyncSession, ids: Sequence[int]) -> dict[int, models.Book]:
+    """
+    Получить сразу несколько книг по списку ID одним запросом (как get_authors_by_ids)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        ids (Sequence[int]): Список ID
+
+    Returns:
+        dict[int, models.Book]: Словарь ID -> объект Book, ненайденных ID в нем нет
+    """
+    if not ids:
+        return {}
+    stmt = (
+        select(models.Book)
+        .where(models.Book.id == _ids_array(ids))
         .options(
             selectinload(models.Book.author),
             selectinload(models.Book.loans)
         )
     )
-    book = await db.execute(statement=stmt)
-    return book.scalar_one_or_none()
+    result = await db.execute(statement=stmt)
+    return {book.id: book for book in result.scalars()}
+
+
+@exception_decorator
+async def get_book_with_relations(
+    db: AsyncSession,
+    book_id: int
+    ) -> Optional[tuple[models.Book, models.Author, list[models.Loan]]]:
+    """
+    Получить книгу, ее автора и выдачи одним запросом.
+    Возвращаем кортеж, чтобы вызывающему коду не нужно было ходить по связям книги
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        book_id (int): ID книги
+
+    Returns:
+        Optional[tuple[models.Book, models.Author, list[models.Loan]]]: (книга, автор, выдачи), либо None
+    """
+    stmt = (
+        select(models.Book, models.Author)
+        .join(models.Book.author)
+        .where(models.Book.id == book_id)
+        .options(
+            contains_eager(models.Book.author), # автор уже есть в JOIN, заполняем связь из него
+            joinedload(models.Book.loans),
+            # в запросе две сущности, поэтому description и bio включаем для каждой отдельно
+            Load(models.Book).undefer_group('details'),
+            Load(models.Author).undefer_group('details')
+        )
+    )
+    result = await db.execute(statement=stmt)
+    row = result.unique().one_or_none()
+    if row is None:
+        return None
+    book, author = row
+    return book, author, list(book.loans)
 
 
 @exception_decorator
-async def get_all_books(db: AsyncSession, skip: int =0, limit: int = 100) -> Sequence[models.Book]:
+async def get_all_books(
+    db: AsyncSession,
+    after_id: Optional[int] = None,
+    limit: int = 100
+    ) -> tuple[Sequence[models.Book], Optional[int]]:
     """
-    Получить все книги с возможностью пропустить первые, указать всего сколько необходимо
+    Получить книги постранично по ключу (keyset), так же как в get_all_authors
 
     Args:
         db (AsyncSession): Активная сессия SQLalchemy
-        skip (int, optional): Сколько книг первых пропустить. Defaults to 0.
+        after_id (Optional[int], optional): ID последней книги с прошлой страницы. Defaults to None (с начала).
         limit (int, optional): Сколько нужно вывести. Defaults to 100.
 
     Returns:
-        Sequence[models.Book]: Последовательность объектов Book
+        tuple[Sequence[models.Book], Optional[int]]: Набор объектов Book и after_id для следующей страницы (None, если книг больше нет)
     """
     stmt = (
         select(models.Book)
-        .offset(skip)
+        .order_by(models.Book.id)
         .limit(limit)
         .options(
             selectinload(models.Book.author),
             selectinload(models.Book.loans)
         )
     )
+    if after_id is not None:
+        stmt = stmt.where(models.Book.id > after_id)
     result = await db.execute(statement=stmt)
-    return result.scalars().all()
+    books = result.scalars().all()
+    return books, (books[-1].id if books and len(books) == limit else None) # неполная страница - последняя
+
+
+@exception_decorator
+async def iter_all_books(db: AsyncSession, batch: int = 500) -> AsyncIterator[models.Book]:
+    """
+    Пройти по всем книгам потоком, по batch строк за раз (как iter_all_authors)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        batch (int, optional): Сколько строк забирать с сервера за раз. Defaults to 500.
+
+    Yields:
+        models.Book: Очередная книга (с автором и выдачами)
+    """
+    stmt = (
+        select(models.Book)
+        .order_by(models.Book.id)
+        .options(
+            selectinload(models.Book.author),
+            selectinload(models.Book.loans)
+        )
+    )
+    async with aclosing(_stream(db, stmt, batch)) as books:
+        async for book in books:
+            yield book
     
     
 @exception_decorator
@@ -242,21 +586,62 @@ async def create_book(
         Optional[models.Book]: Вернется либо созданный объект класса Book, либо None
     """
     
-    book = models.Book(title= title,
-                       isbn = isbn,
-                       published_year = published_year,
-                       author_id = author_id,
-                       description = description,
-                       genre = genre)
-    db.add(book)
-    await db.flush()
-    await db.refresh(book)
-    return book
+    stmt = (
+        insert(models.Book)
+        .values(
+            title = title,
+            isbn = models.validate_isbn(isbn),
+            published_year = models.validate_published_year(published_year),
+            author_id = author_id,
+            description = description,
+            genre = genre
+        )
+        .returning(models.Book)
+        .options(undefer_group('details'))
+    )
+    result = await db.execute(statement=stmt)
+    return result.scalar_one()
+
+
+@exception_decorator
+async def bulk_create_books(db: AsyncSession, rows: Sequence[dict[str, Any]]) -> list[int]:
+    """
+    Создать много книг разом (для наполнения/импорта)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        rows (Sequence[dict[str, Any]]): Словари с полями title, isbn, published_year, author_id, description, genre
+
+    Returns:
+        list[int]: ID созданных книг в порядке rows
+    """
+    return await _bulk_insert(db, models.Book, rows)
+
+@exception_decorator
+async def update_book(db: AsyncSession, book_id: int, **kwargs) -> bool:
+    """
+    Изменить параметры у книги с определенным ID без возврата строки
+    (если измененный объект нужен - update_book_returning)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        book_id (int): ID книги, чьи параметры хотим изменить
+
+    Returns:
+        bool: True, если книга найдена и изменена, False в противном случае
+    """
+    stmt = (update(models.Book)
+            .where(models.Book.id == book_id)
+            .values(_validated(models.Book, kwargs))
+            )
+    result = await db.execute(statement=stmt)
+    cache_invalidate(db, 'book', book_id)
+    return result.rowcount > 0
 
 @exception_decorator
-async def update_book(db: AsyncSession, book_id: int, **kwargs) -> Optional[models.Book]:
+async def update_book_returning(db: AsyncSession, book_id: int, **kwargs) -> Optional[models.Book]:
     """
-    Изменить параметры у книги с определенным ID
+    Изменить параметры у книги с определенным ID и вернуть измененную книгу
 
     Args:
         db (AsyncSession): Активная сессия SQLalchemy
@@ -267,10 +652,12 @@ async def update_book(db: AsyncSession, book_id: int, **kwargs) -> Optional[mode
     """
     stmt = (update(models.Book)
             .where(models.Book.id == book_id)
-            .values(kwargs)
+            .values(_validated(models.Book, kwargs))
             .returning(models.Book)
+            .options(undefer_group('details'))
             )
     book = await db.execute(statement=stmt)
+    cache_invalidate(db, 'book', book_id)
     return book.scalar_one_or_none()
 
 @exception_decorator
@@ -291,6 +678,7 @@ async def delete_book(db: AsyncSession, book_id: int) -> bool:
             )
     
     result = await db.execute(stmt)
+    cache_invalidate(db, 'book', book_id)
     return result.rowcount > 0
 
 
@@ -298,6 +686,13 @@ async def delete_book(db: AsyncSession, book_id: int) -> bool:
 """-----READER-----"""
 
 
+class ReaderActivity(NamedTuple):
+    """Ответ activate_reader/deactivate_reader: только id и новый флаг, без сборки объекта Reader"""
+    id: int
+    is_active: bool
+
+
+
 @exception_decorator
 async def get_reader_by_id(db: AsyncSession, reader_id: int) -> Optional[models.Reader]:
     """
@@ -313,61 +708,132 @@ async def get_reader_by_id(db: AsyncSession, reader_id: int) -> Optional[models.
     stmt = (
         select(models.Reader)
         .where(models.Reader.id == reader_id)
+        .options(
+            joinedload(models.Reader.loans),
+            undefer_group('details')
+        )
+    )
+    result = await db.execute(statement=stmt)
+    return result.unique().scalar_one_or_none()
+
+
+@exception_decorator
+async def get_readers_by_ids(db: AsyncSession, ids: Sequence[int]) -> dict[int, models.Reader]:
+    """
+    Получить сразу несколько читателей по списку ID одним запросом (как get_authors_by_ids)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        ids (Sequence[int]): Список ID
+
+    Returns:
+        dict[int, models.Reader]: Словарь ID -> объект Reader, ненайденных ID в нем нет
+    """
+    if not ids:
+        return {}
+    stmt = (
+        select(models.Reader)
+        .where(models.Reader.id == _ids_array(ids))
         .options(
             selectinload(models.Reader.loans)
         )
     )
     result = await db.execute(statement=stmt)
-    return result.scalar_one_or_none()
+    return {reader.id: reader for reader in result.scalars()}
 
 @exception_decorator
-async def get_all_readers(db: AsyncSession, skip: int = 0, limit: int = 100) -> Sequence[models.Reader]:
+async def get_all_readers(
+    db: AsyncSession,
+    after_id: Optional[int] = None,
+    limit: int = 100
+    ) -> tuple[Sequence[models.Reader], Optional[int]]:
     """
-    Получить всех читателей, можно пропустить
-    skip в начале и задать ограничение на количество получаемых
+    Получить читателей постранично по ключу (keyset), так же как в get_all_authors
 
     Args:
         db (AsyncSession): Активная сессия SQLalchemy
-        skip (int, optional): Сколько пропустить от начала. Defaults to 0.
-        limit (int, optional): Сколько требуется вывести. Defaults to 100.
+        after_id (Optional[int], optional): ID последнего читателя с прошлой страницы. Defaults to None (с начала).
+        limit (int, optional): Сколько нужно вывести. Defaults to 100.
 
     Returns:
-        Sequence[models.Reader]: Набор объектов Reader
+        tuple[Sequence[models.Reader], Optional[int]]: Набор объектов Reader и after_id для следующей страницы (None, если читателей больше нет)
     """
     stmt = (
         select(models.Reader)
-        .offset(skip)
+        .order_by(models.Reader.id)
         .limit(limit)
         .options(
             selectinload(models.Reader.loans)
         )
     )
-    
+    if after_id is not None:
+        stmt = stmt.where(models.Reader.id > after_id)
     result = await db.execute(statement=stmt)
-    return result.scalars().all()
+    readers = result.scalars().all()
+    return readers, (readers[-1].id if readers and len(readers) == limit else None) # неполная страница - последняя
+
+
+@exception_decorator
+async def iter_all_readers(db: AsyncSession, batch: int = 500) -> AsyncIterator[models.Reader]:
+    """
+    Пройти по всем читателям потоком, по batch строк за раз (как iter_all_authors)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        batch (int, optional): Сколько строк забирать с сервера за раз. Defaults to 500.
+
+    Yields:
+        models.Reader: Очередной читатель (с выдачами)
+    """
+    stmt = (
+        select(models.Reader)
+        .order_by(models.Reader.id)
+        .options(
+            selectinload(models.Reader.loans)
+        )
+    )
+    async with aclosing(_stream(db, stmt, batch)) as readers:
+        async for reader in readers:
+            yield reader
     
     
 @exception_decorator
-async def get_reader_by_email(db: AsyncSession, email:str) -> Optional[models.Reader]:
+async def get_reader_by_email(db: AsyncSession, email:str, with_loans: bool = True) -> Optional[models.Reader]:
     """
-    Получить читателя по его email
+    Получить читателя по его email.
+    Без выдач (with_loans=False) читатель берется из кэша
 
     Args:
         db (AsyncSession): Активная сессия SQLalchemy
         email (str): email читателя
+        with_loans (bool, optional): Предзагрузить выдачи. Defaults to True.
 
     Returns:
         Optional[models.Reader]: Объект Reader, либо None, если не нашли
     """
+    if not with_loans:
+        key = ('reader', 'email', email)
+        reader = await cache_get(db, models.Reader, key)
+        if reader is None:
+            result = await db.execute(
+                select(models.Reader)
+                .where(models.Reader.email == email)
+                .options(undefer_group('details'))
+            )
+            reader = result.scalar_one_or_none()
+            cache_put(db, key, reader)
+        return reader
+
     stmt = (
         select(models.Reader)
         .where(models.Reader.email == email)
         .options(
-            selectinload(models.Reader.loans)
+            joinedload(models.Reader.loans),
+            undefer_group('details')
         )
     )
     result = await db.execute(statement=stmt)
-    return result.scalar_one_or_none()
+    return result.unique().scalar_one_or_none()
 
 @exception_decorator
 async def create_reader(
@@ -390,22 +856,62 @@ async def create_reader(
     Returns:
         Optional[models.Reader]: Успешно созданный объект Reader, либо None
     """
-    reader = models.Reader(
-        email = email,
-        full_name = full_name,
-        phone = phone, 
-        address = address,
+    stmt = (
+        insert(models.Reader)
+        .values(
+            email = models.validate_email(email),
+            full_name = full_name,
+            phone = models.validate_phone(phone), # пустая строка -> NULL
+            address = address
+        )
+        .returning(models.Reader)
+        .options(undefer_group('details'))
     )
-    db.add(reader)
-    await db.flush()
-    await db.refresh(reader)
-    return reader
+    result = await db.execute(statement=stmt)
+    return result.scalar_one()
+
+
+@exception_decorator
+async def bulk_create_readers(db: AsyncSession, rows: Sequence[dict[str, Any]]) -> list[int]:
+    """
+    Создать много читателей разом (для наполнения/импорта)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        rows (Sequence[dict[str, Any]]): Словари с полями email, full_name, phone, address
+
+    Returns:
+        list[int]: ID созданных читателей в порядке rows
+    """
+    return await _bulk_insert(db, models.Reader, rows)
 
 
 @exception_decorator
-async def update_reader(db: AsyncSession, reader_id: int, **kwargs) -> Optional[models.Reader]:
+async def update_reader(db: AsyncSession, reader_id: int, **kwargs) -> bool:
     """
-    Обновить информацию читателя, находим его по его ID
+    Обновить информацию читателя по его ID без возврата строки
+    (если измененный объект нужен - update_reader_returning)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        reader_id (int): ID читателя
+
+    Returns:
+        bool: True, если читатель найден и изменен, False в противном случае
+    """
+    stmt = (
+        update(models.Reader)
+        .where(models.Reader.id == reader_id)
+        .values(_validated(models.Reader, kwargs))
+    )
+    result = await db.execute(statement=stmt)
+    cache_invalidate(db, 'reader', reader_id)
+    return result.rowcount > 0
+
+@exception_decorator
+async def update_reader_returning(db: AsyncSession, reader_id: int, **kwargs) -> Optional[models.Reader]:
+    """
+    Обновить информацию читателя, находим его по его ID, и вернуть измененный объект
 
     Args:
         db (AsyncSession): Активная сессия SQLalchemy
@@ -418,10 +924,12 @@ async def update_reader(db: AsyncSession, reader_id: int, **kwargs) -> Optional[
     stmt = (
         update(models.Reader)
         .where(models.Reader.id == reader_id)
-        .values(kwargs)
+        .values(_validated(models.Reader, kwargs))
         .returning(models.Reader)
+        .options(undefer_group('details'))
     )
     result = await db.execute(statement=stmt)
+    cache_invalidate(db, 'reader', reader_id)
     return result.scalar_one_or_none()
 
 @exception_decorator
@@ -441,11 +949,12 @@ async def delete_reader(db: AsyncSession, reader_id: int) -> bool:
         .where(models.Reader.id == reader_id)
     )
     result = await db.execute(stmt)
+    cache_invalidate(db, 'reader', reader_id)
     return result.rowcount > 0
 
 
 @exception_decorator
-async def deactivate_reader(db: AsyncSession, reader_id: int) -> Optional[models.Reader]:
+async def deactivate_reader(db: AsyncSession, reader_id: int) -> Optional[ReaderActivity]:
     """
     Установить читателя как неактивный (заморозить его)
 
@@ -454,21 +963,23 @@ async def deactivate_reader(db: AsyncSession, reader_id: int) -> Optional[models
         reader_id (int): ID читателя
 
     Returns:
-        Optional[models.Reader]: Объект Reader если успешно, None в противном случае
+        Optional[ReaderActivity]: (id, is_active) если успешно, None в противном случае
     """
     stmt = (
         update(models.Reader)
         .where(models.Reader.id == reader_id)
         .values(is_active = False)
-        .returning(models.Reader)
+        .returning(models.Reader.id, models.Reader.is_active) # весь объект не нужен, только флаг
     )
     result = await db.execute(statement=stmt)
-    return result.scalar_one_or_none()
+    cache_invalidate(db, 'reader', reader_id)
+    row = result.one_or_none()
+    return ReaderActivity(*row) if row else None
 
 
 
 @exception_decorator
-async def activate_reader(db: AsyncSession, reader_id: int) -> Optional[models.Reader]:
+async def activate_reader(db: AsyncSession, reader_id: int) -> Optional[ReaderActivity]:
     """
     Установить читателя как активный (разморозить его)
 
@@ -477,33 +988,61 @@ async def activate_reader(db: AsyncSession, reader_id: int) -> Optional[models.R
         reader_id (int): ID читателя
 
     Returns:
-        Optional[models.Reader]: Объект Reader если успешно, None в противном случае
+        Optional[ReaderActivity]: (id, is_active) если успешно, None в противном случае
     """
     stmt = (
         update(models.Reader)
         .where(models.Reader.id == reader_id)
         .values(is_active = True)
-        .returning(models.Reader)
+        .returning(models.Reader.id, models.Reader.is_active) # весь объект не нужен, только флаг
     )
     result = await db.execute(statement=stmt)
-    
-    return result.scalar_one_or_none()
+    cache_invalidate(db, 'reader', reader_id)
+    row = result.one_or_none()
+    return ReaderActivity(*row) if row else None
 
 """-----LOAN-----"""
 """Теперь будем делать через ORM, чтоб в нем потренироваться тоже"""
 
-def _base_loan_query():
+# Статусы выдачи через сами колонки, а не через CASE из Loan.status:
+# по CASE индекс не работает, а эти условия идут по частичным индексам открытых выдач
+_LOAN_IS_ACTIVE = and_(
+    models.Loan.return_date.is_(None),
+    models.Loan.due_date >= func.current_date()
+)
+_LOAN_IS_OVERDUE = and_(
+    models.Loan.return_date.is_(None),
+    models.Loan.due_date < func.current_date()
+)
+
+# Предзагружаем book и reader для записи (чтоб не было лишних запросов).
+# Select неизменяемый (.where() и т.п. возвращают новый), поэтому строим его один раз при импорте
+_BASE_LOAN_QUERY = select(models.Loan).options(
+    selectinload(models.Loan.book),
+    selectinload(models.Loan.reader)
+)
+
+async def _execute_loan_returning(db: AsyncSession, stmt) -> Optional[models.Loan]:
     """
-    Предзагружаем book и reader для записи (чтоб не было лишних запросов)
+    Выполнить INSERT/UPDATE выдачи с RETURNING.
+    RETURNING сущности не включает column_property, поэтому status просим
+    отдельной колонкой в том же RETURNING, иначе он догружался бы лишним SELECT
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        stmt: insert(models.Loan) или update(models.Loan) без returning
 
     Returns:
-        _type_: Select запрос с жадной загрузкой для коллекций
+        Optional[models.Loan]: Объект Loan с заполненным status, либо None
     """
-    
-    return select(models.Loan).options(
-        selectinload(models.Loan.book),
-        selectinload(models.Loan.reader)
-    )
+    result = await db.execute(statement=stmt.returning(models.Loan, models.Loan.status))
+    row = result.one_or_none()
+    if row is None:
+        return None
+    loan, status = row
+    set_committed_value(loan, 'status', status)
+    return loan
+
 
 @exception_decorator
 async def get_loan_by_id(db: AsyncSession, loan_id: int) -> Optional[models.Loan]:
@@ -526,36 +1065,87 @@ async def get_loan_by_id(db: AsyncSession, loan_id: int) -> Optional[models.Loan
     """
 
     stmt = (
-        _base_loan_query()
+        select(models.Loan)
         .where(models.Loan.id == loan_id)
-        
+        .options( # для одной выдачи JOIN дешевле, чем два дополнительных SELECT
+            joinedload(models.Loan.book),
+            joinedload(models.Loan.reader)
+        )
     )
     result = await db.execute(statement=stmt)
     return result.scalar_one_or_none()
 
 
 @exception_decorator
-async def get_all_loans(db: AsyncSession, skip: int = 0, limit: int = 100) -> Sequence[models.Loan]:
+async def get_loans_by_ids(db: AsyncSession, ids: Sequence[int]) -> dict[int, models.Loan]:
     """
-    Получить все выдачи с возможностью их пропустить
-    и указать их лимит.
-    
+    Получить сразу несколько выдач по списку ID одним запросом (как get_authors_by_ids)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        ids (Sequence[int]): Список ID
+
+    Returns:
+        dict[int, models.Loan]: Словарь ID -> объект Loan, ненайденных ID в нем нет
+    """
+    if not ids:
+        return {}
+    stmt = (
+        _BASE_LOAN_QUERY
+        .where(models.Loan.id == _ids_array(ids))
+    )
+    result = await db.execute(statement=stmt)
+    return {loan.id: loan for loan in result.scalars()}
+
+
+@exception_decorator
+async def get_all_loans(
+    db: AsyncSession,
+    after_id: Optional[int] = None,
+    limit: int = 100
+    ) -> tuple[Sequence[models.Loan], Optional[int]]:
+    """
+    Получить выдачи постранично по ключу (keyset), так же как в get_all_authors
 
     Args:
         db (AsyncSession): Активная сессия SQLalchemy
-        skip (int, optional): Сколько выдач пропустить от начала. Defaults to 0.
-        limit (int, optional): Сколько нужно объектов. Defaults to 100.
+        after_id (Optional[int], optional): ID последней выдачи с прошлой страницы. Defaults to None (с начала).
+        limit (int, optional): Сколько нужно вывести. Defaults to 100.
 
     Returns:
-        Sequence[models.Loan]: Набор объектов Loan
+        tuple[Sequence[models.Loan], Optional[int]]: Набор объектов Loan и after_id для следующей страницы (None, если выдач больше нет)
     """
     stmt = (
-        _base_loan_query()
-        .offset(skip)
+        _BASE_LOAN_QUERY
+        .order_by(models.Loan.id)
         .limit(limit)
     )
+    if after_id is not None:
+        stmt = stmt.where(models.Loan.id > after_id)
     result = await db.execute(statement=stmt)
-    return result.scalars().all()
+    loans = result.scalars().all()
+    return loans, (loans[-1].id if loans and len(loans) == limit else None) # неполная страница - последняя
+
+
+@exception_decorator
+async def iter_all_loans(db: AsyncSession, batch: int = 500) -> AsyncIterator[models.Loan]:
+    """
+    Пройти по всем выдачам потоком, по batch строк за раз (как iter_all_authors)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        batch (int, optional): Сколько строк забирать с сервера за раз. Defaults to 500.
+
+    Yields:
+        models.Loan: Очередная выдача (с книгой и читателем)
+    """
+    stmt = (
+        _BASE_LOAN_QUERY
+        .order_by(models.Loan.id)
+    )
+    async with aclosing(_stream(db, stmt, batch)) as loans:
+        async for loan in loans:
+            yield loan
 
 
 @exception_decorator
@@ -571,14 +1161,35 @@ async def get_active_loans(db: AsyncSession) -> Sequence[models.Loan]:
     """
     
     stmt = (
-        _base_loan_query()
-        .where(models.Loan.status == models.LoanStatus.ACTIVE) # type: ignore
+        _BASE_LOAN_QUERY
+        .where(_LOAN_IS_ACTIVE)
     )
     
     result = await db.execute(statement=stmt)
     return result.scalars().all()
 
 
+@exception_decorator
+async def iter_active_loans(db: AsyncSession, batch: int = 500) -> AsyncIterator[models.Loan]:
+    """
+    Пройти по активным выдачам потоком, без загрузки всего списка в память (см. _stream)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        batch (int, optional): Сколько строк забирать с сервера за раз. Defaults to 500.
+
+    Yields:
+        models.Loan: Очередная выдача (с книгой и читателем)
+    """
+    stmt = (
+        _BASE_LOAN_QUERY
+        .where(_LOAN_IS_ACTIVE)
+    )
+    async with aclosing(_stream(db, stmt, batch)) as loans:
+        async for loan in loans:
+            yield loan
+
+
 @exception_decorator
 async def get_overdue_loans(db: AsyncSession) -> Sequence[models.Loan]:
     """
@@ -591,13 +1202,34 @@ async def get_overdue_loans(db: AsyncSession) -> Sequence[models.Loan]:
         Sequence[models.Loan]: Набор объектов Loan, у которых models.Loan.status = 'overdue'
     """
     stmt = (
-        _base_loan_query()
-        .where(models.Loan.status == models.LoanStatus.OVERDUE) # type: ignore
+        _BASE_LOAN_QUERY
+        .where(_LOAN_IS_OVERDUE)
     )
     result = await db.execute(statement=stmt)
     return result.scalars().all()
 
 
+@exception_decorator
+async def iter_overdue_loans(db: AsyncSession, batch: int = 500) -> AsyncIterator[models.Loan]:
+    """
+    Пройти по просроченным выдачам потоком, без загрузки всего списка в память (см. _stream)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        batch (int, optional): Сколько строк забирать с сервера за раз. Defaults to 500.
+
+    Yields:
+        models.Loan: Очередная выдача (с книгой и читателем)
+    """
+    stmt = (
+        _BASE_LOAN_QUERY
+        .where(_LOAN_IS_OVERDUE)
+    )
+    async with aclosing(_stream(db, stmt, batch)) as loans:
+        async for loan in loans:
+            yield loan
+
+
 @exception_decorator
 async def get_loans_by_reader(db: AsyncSession, reader_id: int) -> Sequence[models.Loan]:
     """
@@ -611,9 +1243,55 @@ async def get_loans_by_reader(db: AsyncSession, reader_id: int) -> Sequence[mode
         Sequence[models.Loan]: Набор объектов Loan для конкретного читателя
     """
     stmt = (
-        _base_loan_query()
+        _BASE_LOAN_QUERY
+        .where(models.Loan.reader_id == reader_id)
+
+    )
+    result = await db.execute(statement=stmt)
+    return result.scalars().all()
+
+
+@exception_decorator
+async def iter_loans_by_reader(db: AsyncSession, reader_id: int, batch: int = 500) -> AsyncIterator[models.Loan]:
+    """
+    Пройти по выдачам читателя потоком, без загрузки всего списка в память (см. _stream)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        reader_id (int): ID читателя
+        batch (int, optional): Сколько строк забирать с сервера за раз. Defaults to 500.
+
+    Yields:
+        models.Loan: Очередная выдача (с книгой и читателем)
+    """
+    stmt = (
+        _BASE_LOAN_QUERY
         .where(models.Loan.reader_id == reader_id)
+    )
+    async with aclosing(_stream(db, stmt, batch)) as loans:
+        async for loan in loans:
+            yield loan
+
+
+@exception_decorator
+async def get_open_loans_by_reader(db: AsyncSession, reader_id: int) -> Sequence[models.Loan]:
+    """
+    Получить невозвращенные книги читателя, ближайший срок возврата первым
 
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        reader_id (int): ID читателя
+
+    Returns:
+        Sequence[models.Loan]: Набор объектов Loan с return_date IS NULL, отсортированный по due_date
+    """
+    stmt = (
+        _BASE_LOAN_QUERY
+        .where(
+            models.Loan.reader_id == reader_id,
+            models.Loan.return_date.is_(None) # условие частичного индекса ix_loan_open_reader
+        )
+        .order_by(models.Loan.due_date) # порядок индекса, отдельной сортировки нет
     )
     result = await db.execute(statement=stmt)
     return result.scalars().all()
@@ -632,12 +1310,34 @@ async def get_loans_by_book(db: AsyncSession, book_id:int) -> Sequence[models.Lo
         Sequence[models.Loan]: Набор объектов Loan для конкретной книги
     """
     stmt = (
-        _base_loan_query()
+        _BASE_LOAN_QUERY
         .where(models.Loan.book_id == book_id)
     )
     result = await db.execute(statement=stmt)
     return result.scalars().all()
 
+
+@exception_decorator
+async def iter_loans_by_book(db: AsyncSession, book_id: int, batch: int = 500) -> AsyncIterator[models.Loan]:
+    """
+    Пройти по выдачам книги потоком, без загрузки всего списка в память (см. _stream)
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        book_id (int): ID книги
+        batch (int, optional): Сколько строк забирать с сервера за раз. Defaults to 500.
+
+    Yields:
+        models.Loan: Очередная выдача (с книгой и читателем)
+    """
+    stmt = (
+        _BASE_LOAN_QUERY
+        .where(models.Loan.book_id == book_id)
+    )
+    async with aclosing(_stream(db, stmt, batch)) as loans:
+        async for loan in loans:
+            yield loan
+
 @exception_decorator
 async def create_loan(
     db: AsyncSession,
@@ -654,24 +1354,46 @@ async def create_loan(
         db (AsyncSession): Активная сессия SQLalchemy
         book_id (int): ID книги
         reader_id (int): ID читателя
-        loan_date (Optional[date], optional): Дата выдачи(в бд current_date). Defaults to None.
-        due_date (Optional[date], optional): На сколько будет выдача (в бд на 14 дней). Defaults to None.
+        loan_date (Optional[date], optional): Дата выдачи. Defaults to None (сегодня).
+        due_date (Optional[date], optional): Срок возврата. Defaults to None (loan_date + 14 дней).
 
     Returns:
         models.Loan: Успешно созданный объект Loan
     """
     
-    loan = models.Loan(
-        book_id = book_id,
-        reader_id = reader_id,
-        loan_date = loan_date,
-        due_date = due_date
+    # None не передаем: обе даты проставят default колонок (с одних часов),
+    # и они вернутся в том же INSERT ... RETURNING
+    values = {'book_id': book_id, 'reader_id': reader_id}
+    if loan_date is not None:
+        values['loan_date'] = loan_date
+    if due_date is not None:
+        values['due_date'] = due_date
+
+    stmt = (
+        insert(models.Loan)
+        .values(values)
     )
-    
-    db.add(loan)
-    await db.flush()
-    await db.refresh(loan)
-    return loan
+    return await _execute_loan_returning(db, stmt)
+
+
+@exception_decorator
+async def bulk_create_loans(db: AsyncSession, rows: Sequence[dict[str, Any]]) -> list[int]:
+    """
+    Создать много выдач разом.
+    None выкидываем, чтобы для loan_date и due_date сработали значения по умолчанию
+
+    Args:
+        db (AsyncSession): Активная сессия SQLalchemy
+        rows (Sequence[dict[str, Any]]): Словари с полями book_id, reader_id, loan_date, due_date
+
+    Returns:
+        list[int]: ID созданных выдач в порядке rows
+    """
+    prepared = [
+        {key: value for key, value in row.items() if value is not None}
+        for row in rows
+    ]
+    return await _bulk_insert(db, models.Loan, prepared)
 
 
 @exception_decorator
@@ -690,10 +1412,8 @@ async def return_book(db: AsyncSession, loan_id: int) -> Optional[models.Loan]:
         update(models.Loan)
         .where(models.Loan.id == loan_id)
         .values(return_date = date.today())
-        .returning(models.Loan)
     )
-    res = await db.execute(statement=stmt)
-    return res.scalar_one_or_none()
+    return await _execute_loan_returning(db, stmt)
 
 
 @exception_decorator
@@ -708,10 +1428,14 @@ async def get_debtors(db: AsyncSession) -> Sequence[models.Reader]:
         Sequence[models.Reader]: Набор объектов Reader, кто должен книгу (models.Loan.status == 'overdue')
     """
     
+    # подзапрос идет по частичному индексу ix_loan_open_reader, а не по всем выдачам
+    overdue_readers = (
+        select(models.Loan.reader_id)
+        .where(_LOAN_IS_OVERDUE)
+    )
     stmt = (
         select(models.Reader)
-        .where(models.Reader.id == models.Loan.reader_id, models.Loan.status == models.LoanStatus.OVERDUE)# type: ignore
-        .distinct()
+        .where(models.Reader.id.in_(overdue_readers))
     )
     result = await db.execute(statement=stmt)
     return result.scalars().all()
@@ -732,9 +1456,32 @@ async def delete_loan(db: AsyncSession, loan_id: int) -> bool:
     stmt = (
         delete(models.Loan)
         .where(models.Loan.id == loan_id)
-        .returning(models.Loan.id)  # возвращаем ID, чтобы знать, что удалили
     )
     
     result = await db.execute(stmt)
-    
-    return result.scalar_one_or_none() is not None
\ No newline at end of file
+    return result.rowcount > 0
+
+
+@exception_decorator
+async def delete_loans(db: AsyncSession, ids: Sequence[int]) -> int:
+    """
+    Удалить несколько выдач одним DELETE ... WHERE id = ANY(:ids).
+    Сессию не синхронизируем: уже загруженные объекты этих выдач остаются в ней как есть
+
+    Args:
+        db (AsyncSession): Активная сессия SQLAlchemy
+        ids (Sequence[int]): Список ID выдач
+
+    Returns:
+        int: Сколько выдач удалили
+    """
+    if not ids:
+        return 0
+    stmt = (
+        delete(models.Loan)
+        .where(models.Loan.id == _ids_array(ids))
+        # = ANY(:ids) в питоне не вычислить, и 'auto' перешел бы на 'fetch' с RETURNING id на каждую строку
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    return result.rowcount
\ No newline at end of file
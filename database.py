@@ -1,7 +1,16 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import event, orm, make_url
 import models
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Optional, Iterator
+from uuid import uuid4
+import logging
 import os
+import asyncio
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
@@ -12,9 +21,54 @@ if not DATABASE_URL:
     raise ValueError("DATABASE_URL не установлен в переменных окружения")
 
 
+# Пул: по замерам ~25 соединений - оптимум вплоть до ~500 конкурентных клиентов,
+# дальше рост пула уже не даёт пропускной способности
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "25"))
+POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "10"))
+
+
+def _connect_args(url: str) -> dict:
+    """
+    Настройки соединения под конкретный драйвер: у asyncpg и psycopg (v3) разные параметры.
+    Пакетная вставка работает на обоих через insertmanyvalues (в 2.0 включено по умолчанию):
+    executemany с RETURNING уходит одним INSERT ... VALUES (...), (...) на пачку
+
+    Args:
+        url (str): DATABASE_URL
+
+    Returns:
+        dict: connect_args для create_async_engine
+    """
+    driver = make_url(url).get_driver_name()
+    if driver == "asyncpg":
+        return {
+            # кэш подготовленных запросов на соединение: повторный запрос не парсится и не планируется заново
+            "statement_cache_size": 1024,
+            "prepared_statement_cache_size": 1024,
+            "server_settings": {
+                "jit": "off", # JIT в PostgreSQL только замедляет короткие OLTP запросы
+                "application_name": "async_library",
+            },
+        }
+    if driver in ("psycopg", "psycopg_async"):
+        return {
+            "prepare_threshold": 1, # готовим запрос со второго выполнения, а не с шестого
+            "options": "-c jit=off",
+            "application_name": "async_library",
+        }
+    return {}
+
+
 engine = create_async_engine(
         url=DATABASE_URL,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_OVERFLOW,
+        pool_timeout=30, # сколько ждём свободное соединение, прежде чем упасть
+        pool_recycle=1800, # пересоздаём соединения раз в полчаса
         pool_pre_ping = True,
+        connect_args=_connect_args(DATABASE_URL),
+        insertmanyvalues_page_size=models.BULK_BATCH_SIZE, # строк в одном INSERT при executemany
         echo = False
         )
     
@@ -23,21 +77,90 @@ Session = async_sessionmaker(
     expire_on_commit=False)
 
 
+# Режим разработки: считаем SQL запросы и ленивые загрузки на каждый get_db()
+NPLUSONE = os.getenv("NPLUSONE") == "1"
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_request_stats: ContextVar[Optional[dict[str, int]]] = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def track_queries(label: Optional[str] = None) -> Iterator[dict[str, int]]:
+    """
+    Считаем запросы к бд внутри блока и пишем итог в лог.
+    Метка попадает в request_id, чтобы предупреждения о ленивых загрузках
+    было видно, из какого места они пришли
+
+    Args:
+        label (Optional[str], optional): Метка запроса. Defaults to None (случайный id).
+
+    Yields:
+        dict[str, int]: Счетчики queries и lazy_loads
+    """
+    stats = {"queries": 0, "lazy_loads": 0}
+    id_token = request_id.set(label or uuid4().hex[:8])
+    stats_token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        logger.info(
+            "[%s] SQL запросов: %d, ленивых загрузок: %d",
+            request_id.get(), stats["queries"], stats["lazy_loads"]
+        )
+        _request_stats.reset(stats_token)
+        request_id.reset(id_token)
+
+
+if NPLUSONE:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["queries"] += 1
+
+    @event.listens_for(orm.Session, "do_orm_execute")
+    def _warn_lazy_load(orm_execute_state):
+        # lazy_loaded_from заполнен только у ленивой загрузки связи (не у selectinload/joinedload)
+        if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+            return
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["lazy_loads"] += 1
+        logger.warning(
+            "[%s] %s загружено лениво, добавьте selectinload/joinedload в запрос",
+            request_id.get(), orm_execute_state.loader_strategy_path.path[-1]
+        )
+
+
 @asynccontextmanager
-async def get_db():
-    async with Session() as session: #управляем жизнью сессии
-        try:
-            async with session.begin(): # начинает транзакцию внутри существующей сессии
-                yield session
-        except Exception as e:
-            print('Ошибка', e)
-            raise
+async def get_db(label: Optional[str] = None):
+    with track_queries(label) if NPLUSONE else nullcontext():
+        async with Session() as session: #управляем жизнью сессии
+            try:
+                async with session.begin(): # начинает транзакцию внутри существующей сессии
+                    yield session
+            except Exception as e:
+                print('Ошибка', e)
+                raise
         
         
 async def init_db() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.drop_all)
         await conn.run_sync(models.Base.metadata.create_all)
+    await warmup_pool()
+
+
+async def warmup_pool(n: int = POOL_SIZE) -> None:
+    """
+    Заранее открываем n соединений и возвращаем их в пул,
+    чтобы первые запросы не тратили время на подключение к бд.
+    Больше pool_size открывать нет смысла: лишние соединения пул просто закроет
+    """
+    n = min(n, POOL_SIZE)
+    conns = await asyncio.gather(*(engine.connect().start() for _ in range(n)))
+    await asyncio.gather(*(conn.close() for conn in conns))
+
 
 async def close_db_engine() -> None:
     """Закрываем соединение с бд"""
@@ -1,40 +1,61 @@
 from functools import wraps
+from inspect import isasyncgenfunction
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+import os
+
+# Без CRUD_DEBUG декоратор ничего не оборачивает: лишний кадр корутины и try на каждый вызов не нужны
+CRUD_DEBUG = bool(os.getenv("CRUD_DEBUG"))
+
+
+def _log_error(logger: logging.Logger, func_name: str, error: Exception) -> None:
+    """Пишем в лог ошибку CRUD-функции, разделяя ошибки SQLAlchemy и общие"""
+    if isinstance(error, OperationalError):
+        logger.exception("Ошибка операции/соединения в %s", func_name)
+    elif isinstance(error, IntegrityError):
+        logger.exception("Ошибка целостности в %s", func_name)
+    elif isinstance(error, SQLAlchemyError):
+        logger.exception('Во время выполнения %s произошла ошибка уровня sqlalchemy', func_name)
+    else:
+        logger.exception('Во время выполнения %s произошла ошибка', func_name)
+
 
 def exception_decorator(func):
     """
     Декоратор для обработки исключений в CRUD-функциях.
+    Работает только при CRUD_DEBUG, иначе возвращает функцию как есть.
+    Поддерживает и корутины, и асинхронные генераторы (iter_all_*).
     
-    - Проверяет, что сессия передана и активна
-    - Логирует начало выполнения
+    - Логирует начало выполнения (уровень DEBUG)
     - Разделяет ошибки SQLAlchemy и общие исключения
     - Пробрасывает исключения дальше
     """
+    if not CRUD_DEBUG:
+        return func
+    
+    logger = logging.getLogger(func.__module__) # логи идут от имени модуля с CRUD, а не декоратора
+    
+    if isasyncgenfunction(func): # генератор нельзя await-ить, отдаем его элементы дальше
+        @wraps(func)
+        async def gen_wrapper(db: AsyncSession, *args, **kwargs):
+            try:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Выполняется функция %s', func.__name__)
+                async for item in func(db, *args, **kwargs):
+                    yield item
+            except Exception as e:
+                _log_error(logger, func.__name__, e)
+                raise
+        return gen_wrapper
     
     @wraps(func)
     async def wrapper(db: AsyncSession, *args, **kwargs):
-        if not db.is_active:
-            raise(RuntimeError(f"Сессия неактивна в {func.__name__}"))
         try:
-            print(f'Выполняется функция {func.__name__}')
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Выполняется функция %s', func.__name__)
             return await func(db, *args, **kwargs)
-        
-    
-        except OperationalError as e:
-            print(f"Ошибка операции/соединения в {func.__name__}: {e}")
-            raise
-        
-        except IntegrityError as e:
-            print(f"Ошибка целостности в {func.__name__} - {e}")
-            raise
-        
-        except SQLAlchemyError as e:
-            print(f'Во время выполнения {func.__name__} произошла ошибка уровня sqlalchemy {e}')
-            raise
-        
         except Exception as e:
-            print(f'Во время выполнения {func.__name__} произошла ошибка {e}')
+            _log_error(logger, func.__name__, e)
             raise
-    return wrapper
-            
\ No newline at end of file
+    return wrapper
\ No newline at end of file
@@ -1,7 +1,10 @@
 import asyncio
+import logging
 from database import get_db, init_db, close_db_engine
 import crud
+import cache
 from datetime import date, timedelta
+from sqlalchemy.exc import IntegrityError
 
 async def test_authors():
     """
@@ -23,11 +26,11 @@ async def test_authors():
         print(f"Получен автор: {fetched.name}")
         
         # Обновление
-        updated = await crud.update_author(db, author.id, bio="Обновлённая биография")
+        updated = await crud.update_author_returning(db, author.id, bio="Обновлённая биография")
         print(f"Обновлён автор: {updated.bio}")
         
         # Получение всех
-        all_authors = await crud.get_all_authors(db)  # переименуй функцию!
+        all_authors, _ = await crud.get_all_authors(db)  # переименуй функцию!
         print(f"Всего авторов: {len(all_authors)}")
         
         # Удаление
@@ -56,8 +59,8 @@ async def test_books():
         print(f"Создана книга: {book.title}, id={book.id}")
         
         # Получение книги с автором и выдачами
-        fetched = await crud.get_book_by_id(db, book.id)
-        print(f"Автор книги: {fetched.author.name}")
+        fetched, fetched_author, fetched_loans = await crud.get_book_with_relations(db, book.id)
+        print(f"Автор книги: {fetched_author.name}, выдач: {len(fetched_loans)}")
         
         # Книги по автору
         author_books = await crud.get_books_by_author(db, author.id)
@@ -99,6 +102,45 @@ async def test_readers():
         # Очистка
         await crud.delete_reader(db, reader.id)
 
+async def test_cache():
+    """
+    Тестируем кэш чтений: попадание, сброс после изменения и откат
+    """
+    
+    async with get_db() as db:
+        author = await crud.create_author(db, name="Кэшируемый автор", bio="Исходная биография")
+    key = ('author', author.id)
+    
+    # Попадание: прочитанное кладется в кэш только после коммита
+    async with get_db() as db:
+        await crud.get_author_by_id(db, author.id, with_books=False)
+    print(f"В кэше после чтения: {cache.is_cached(key)}")
+    async with get_db() as db:
+        cached = await crud.get_author_by_id(db, author.id, with_books=False)
+        print(f"Из кэша: {cached.bio}")
+    
+    # Сброс: своя транзакция видит изменение, после коммита ключ уходит из кэша
+    async with get_db() as db:
+        await crud.update_author(db, author.id, bio="Новая биография")
+        fresh = await crud.get_author_by_id(db, author.id, with_books=False)
+        print(f"В той же транзакции: {fresh.bio}")
+    print(f"В кэше после изменения: {cache.is_cached(key)}")
+    
+    # Откат: ни изменение, ни прочитанное в откаченной транзакции в кэш не попадают
+    try:
+        async with get_db() as db:
+            await crud.update_author(db, author.id, bio="Несохраненная биография")
+            await crud.get_author_by_id(db, author.id, with_books=False)
+            await crud.create_book(db, title="Ошибка", isbn="не isbn", published_year=2000, author_id=author.id)
+    except ValueError:
+        print("Транзакция откачена")
+    print(f"В кэше после отката: {cache.is_cached(key)}")
+    
+    async with get_db() as db:
+        after = await crud.get_author_by_id(db, author.id, with_books=False)
+        print(f"После отката: {after.bio}")
+        await crud.delete_author(db, author.id)
+
 async def test_loans():
     """
     Тестируем операции с выдачами
@@ -108,47 +150,60 @@ async def test_loans():
     async with get_db() as db:
         # Создаём тестовые данные
         author = await crud.create_author(db, name="Автор для выдач")
-        book = await crud.create_book(
-            db=db,
-            title="Книга для выдач",
-            isbn="9783161484117",
-            published_year=2020,
-            author_id=author.id
-        )
+        # две книги одним INSERT: вторую выдадим с просрочкой
+        book_id, overdue_book_id = await crud.bulk_create_books(db, [
+            {
+                "title": "Книга для выдач",
+                "isbn": "9783161484117",
+                "published_year": 2020,
+                "author_id": author.id
+            },
+            {
+                "title": "Просроченная книга",
+                "isbn": "9783161484124",
+                "published_year": 2021,
+                "author_id": author.id
+            },
+        ])
         reader = await crud.create_reader(
             db=db,
             email="reader@mail.ru",
             full_name="Читатель Петров"
         )
         
-        # Создание выдачи
-        loan = await crud.create_loan(
-            db=db,
-            book_id=book.id,
-            reader_id=reader.id,
-            due_date=date.today() + timedelta(days=14)
-        )
-        print(f"Создана выдача id={loan.id}, статус: {loan.status}")
+        # Создание выдач (обычной и просроченной) одним INSERT
+        loan_id, overdue_loan_id = await crud.bulk_create_loans(db, [
+            {
+                "book_id": book_id,
+                "reader_id": reader.id,
+                "due_date": date.today() + timedelta(days=14)
+            },
+            {
+                "book_id": overdue_book_id,
+                "reader_id": reader.id,
+                "due_date": date.today() - timedelta(days=5)  # просрочка
+            },
+        ])
         
         # Получение по ID
-        fetched = await crud.get_loan_by_id(db, loan.id)
+        fetched = await crud.get_loan_by_id(db, loan_id)
+        print(f"Создана выдача id={fetched.id}, статус: {fetched.status}")
         print(f"Получена выдача: книга {fetched.book.title}, читатель {fetched.reader.full_name}")
         
         # Активные выдачи
         active = await crud.get_active_loans(db)
         print(f"Активных выдач: {len(active)}")
         
-        # Просроченные (создадим просрочку)
-        overdue_loan = await crud.create_loan(
-            db,
-            book_id=book.id,  # тут будет конфликт! книга уже выдана
-            reader_id=reader.id,
-            due_date=date.today() - timedelta(days=5)  # просрочка
-        )
-        # Ждём конфликта от unique index
+        # Повторная выдача той же книги: ждём конфликта от unique index.
+        # Savepoint, чтобы ошибка не оборвала всю транзакцию теста
+        try:
+            async with db.begin_nested():
+                await crud.create_loan(db, book_id=book_id, reader_id=reader.id)
+        except IntegrityError:
+            print("Книга уже выдана, повторная выдача отклонена")
         
         # Возврат книги
-        returned = await crud.return_book(db, loan.id)
+        returned = await crud.return_book(db, loan_id)
         print(f"Книга возвращена: {returned.return_date}")
         
         # Должники
@@ -156,10 +211,10 @@ async def test_loans():
         print(f"Должников: {len(debtors)}")
         
         # Очистка
-        await crud.delete_loan(db, loan.id)
-        await crud.delete_loan(db, overdue_loan.id) 
+        await crud.delete_loans(db, [loan_id, overdue_loan_id])
         await crud.delete_reader(db, reader.id)   
-        await crud.delete_book(db, book.id)
+        await crud.delete_book(db, book_id)
+        await crud.delete_book(db, overdue_book_id)
         await crud.delete_author(db, author.id)
 
 async def main():
@@ -168,10 +223,19 @@ async def main():
     await init_db()
     
     try:
-        await test_authors()
-        await test_books()
-        await test_readers()
-        await test_loans()
+        # тесты не зависят друг от друга, гоняем их параллельно через пул соединений.
+        # return_exceptions - чтобы дождаться всех и только потом закрыть движок
+        results = await asyncio.gather(
+            test_authors(),
+            test_books(),
+            test_readers(),
+            test_loans(),
+            test_cache(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
         
     except Exception as e:
         print(f"Возникла ошибка {e}")
@@ -182,4 +246,5 @@ async def main():
         
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     asyncio.run(main())
\ No newline at end of file
@@ -4,56 +4,115 @@
 
 """
 
-from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase, validates, relationship
-from sqlalchemy import Integer, CheckConstraint, and_, DateTime, String, ForeignKey, Text, func, Date, Boolean, Index, text, case, event
+from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase, validates, relationship, column_property
+from sqlalchemy import Integer, BigInteger, Identity, CheckConstraint, DateTime, String, ForeignKey, Text, func, Date, Boolean, Index, text, case
 from datetime import datetime, date, timedelta
-from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.ext.associationproxy import association_proxy
+from typing import Optional
+import re
 
 
 
+LOAN_PERIOD_DAYS = 14 # на сколько дней выдаем книгу по умолчанию
+# Строк в одном INSERT ... VALUES при массовой вставке: у PostgreSQL выигрыш растет примерно до 1000
+# и дальше падает. Столько же стоит insertmanyvalues_page_size у движка (database.py), так что
+# session.execute(insert(Loan), rows) лучше передавать пачками не больше BULK_BATCH_SIZE строк
+BULK_BATCH_SIZE = 1000
+_ISBN_RE = re.compile(r'[0-9]{13}')
+_ALLOWED_EMAIL_DOMAINS = ('@mail.ru', '@yandex.ru', '@gmail.com')
+_PHONE_PREFIXES = ('+7', '8')
+_PHONE_LENGTHS = frozenset((11, 12))
+
+
+def _default_due_date(context) -> date:
+    """
+    Срок возврата по умолчанию: loan_date + LOAN_PERIOD_DAYS.
+    Считается по параметрам самой строки, поэтому работает и в пакетном INSERT (insertmanyvalues),
+    в отличие от события before_insert. Пропущенный loan_date к этому моменту уже заполнен
+    default колонки тем же date.today(), так что обе даты берутся с одних часов
+    """
+    loan_date = context.get_current_parameters()['loan_date']
+    return loan_date + timedelta(days=LOAN_PERIOD_DAYS)
+
+
+# Проверки полей отдельными функциями: их вызывают и @validates моделей, и crud перед insert()/update(),
+# где валидаторы ORM не срабатывают
+
+def validate_isbn(value: str) -> str:
+    if not _ISBN_RE.fullmatch(value):
+        raise ValueError("ISBN должен состоять ровно из 13 цифр")
+    return value
+
+
+def validate_published_year(value: int) -> int:
+    if not 1000 <= value <= date.today().year: # в бд только постоянный диапазон ck_book_year_range
+        raise ValueError("Год издания должен быть между 1000 и текущим")
+    return value
+
+
+def validate_email(value: str) -> str:
+    if not value.endswith(_ALLOWED_EMAIL_DOMAINS): # домен должен быть в конце, а не где угодно
+        raise ValueError('Это не емейл!')
+    return value
+
+
+def validate_phone(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None # пустой номер храним как NULL
+    if value.startswith(_PHONE_PREFIXES) and len(value) in _PHONE_LENGTHS:
+        return value
+    raise ValueError("неверный формат номера")
+
+
 class Base(DeclarativeBase): #чтоб наследование было
     pass
 
+
+# Порядок колонок в моделях = порядок в таблице. PostgreSQL выравнивает поля строки, поэтому
+# объявляем их от широких к узким, чтобы не было дыр на выравнивание:
+# 8 байт (BigInteger id/FK, DateTime) -> 4 байта (Integer, Date) -> Boolean -> String/Text в конце.
+# Новые колонки добавляем в свою группу, а не в конец класса
+
 class Author(Base):
     
     __tablename__ = 'author'
     
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    name: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
-    bio: Mapped[str] = mapped_column(Text, nullable=True)
-    birth_date: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    birth_date: Mapped[date] = mapped_column(Date, nullable=True)
+    name: Mapped[str] = mapped_column(Text, nullable=False, unique=True)
+    # длинные тексты в списках не нужны: грузятся только по undefer_group('details'),
+    # обращение к незагруженному полю сразу падает, а не идет в бд лениво
+    bio: Mapped[str] = mapped_column(Text, nullable=True, deferred=True, deferred_group='details', deferred_raiseload=True)
     
     
-    books: Mapped[list['Book']] = relationship(back_populates='author') # создать в book поле author
+    # lazy='raise': ленивой подгрузки в async нет, книги грузим явно через selectinload/joinedload в запросе
+    books: Mapped[list['Book']] = relationship(back_populates='author', lazy='raise') # создать в book поле author
     
 
 class Book(Base):
     
     __tablename__ = 'book'
     
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    title: Mapped[str] = mapped_column(String(200), nullable=False)
-    isbn: Mapped[str] = mapped_column(String(13), unique=True, nullable=False)
-    description: Mapped[str] = mapped_column(Text, nullable=True)
-    published_year: Mapped[int] = mapped_column(Integer, nullable=False)
-    genre: Mapped[str] = mapped_column(String(50), nullable=True)
-    author_id: Mapped[int] = mapped_column(Integer, ForeignKey('author.id'), nullable=False, unique=False)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    author_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('author.id'), nullable=False, unique=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    published_year: Mapped[int] = mapped_column(Integer, nullable=False)
+    title: Mapped[str] = mapped_column(Text, nullable=False)
+    isbn: Mapped[str] = mapped_column(String(13), unique=True, nullable=False)
+    genre: Mapped[str] = mapped_column(Text, nullable=True)
+    description: Mapped[str] = mapped_column(Text, nullable=True, deferred=True, deferred_group='details', deferred_raiseload=True) # как Author.bio
     
     author: Mapped['Author'] = relationship(back_populates='books') #у автора есть книги
-    loans: Mapped[list['Loan']] = relationship(back_populates='book')
+    loans: Mapped[list['Loan']] = relationship(back_populates='book', lazy='raise') # грузить через options() в запросе
     
     
     @validates('isbn')
     def check_isbn(self, key, value):
-        if len(value) != 13:
-            raise ValueError("Isbn не содержит 13 символов")
-        for elem in value:
-            if not elem.isdigit():
-                raise ValueError("Ошибка в ISBN, встретили не цифру")
-        return value
+        return validate_isbn(value)
+    
+    @validates('published_year')
+    def check_published_year(self, key, value: int):
+        return validate_published_year(value)
             
     """__table_args__ = ( #Либо так
         CheckConstraint(
@@ -61,12 +120,12 @@ class Book(Base):
         ))
 """
     __table_args__ = ( #либо так, получше
-        CheckConstraint(
-            and_(
-                published_year >= 1000,
-                published_year <= func.extract('year', func.current_date())
-            )
-        ),
+        # постоянный диапазон, без current_date() на каждую строку; "не из будущего" проверяет
+        # validate_published_year в crud, записи в обход crud ограничены только 2999 годом
+        CheckConstraint('published_year BETWEEN 1000 AND 2999', name='ck_book_year_range'),
+        # то же, что validate_isbn, но на стороне бд: для записей в обход crud
+        CheckConstraint("isbn ~ '^[0-9]{13}$'", name='ck_book_isbn_format'),
+        Index('ix_book_author_id', 'author_id'), # Author.books и удаление автора без полного скана book
     )
     
     
@@ -75,74 +134,71 @@ class Reader(Base):
     
     __tablename__ = 'reader'
     
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    email: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
-    full_name: Mapped[str] = mapped_column(String(150), nullable=False)
-    phone: Mapped[str] = mapped_column(String(20), nullable=True)
-    address: Mapped[str] = mapped_column(Text, nullable=True)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
     registered_at: Mapped[date] = mapped_column(Date, server_default=func.current_date())
-    is_active: Mapped[bool] = mapped_column(Boolean, server_default='True')
+    is_active: Mapped[bool] = mapped_column(Boolean, server_default=text('true'), nullable=False)
+    email: Mapped[str] = mapped_column(Text, unique=True, nullable=False)
+    full_name: Mapped[str] = mapped_column(Text, nullable=False)
+    phone: Mapped[str] = mapped_column(Text, nullable=True)
+    address: Mapped[str] = mapped_column(Text, nullable=True, deferred=True, deferred_group='details', deferred_raiseload=True) # как Author.bio
     
-    loans: Mapped[list['Loan']] = relationship(back_populates='reader')
+    loans: Mapped[list['Loan']] = relationship(back_populates='reader', lazy='raise') # грузить через options() в запросе
     
-    books_taken = association_proxy('loans', 'book') # для связи loans.book, отсюда можем их смоетрть
+    # книги, которые читатель брал (по одной на выдачу), через таблицу loan, только чтение: selectinload(Reader.books_taken)
+    # грузит их одним SELECT с JOIN вместо loans и отдельного book на каждую выдачу
+    # lazy='raise', а не 'selectin': как и у loans, иначе каждый запрос читателя (списки, кэш)
+    # тянул бы лишний SELECT книг, даже если books_taken не нужен
+    books_taken: Mapped[list['Book']] = relationship('Book', secondary='loan', viewonly=True, lazy='raise')
     
     @validates('email')
     def check_email(self, key, value:str):
-        emails = ['@mail.ru', '@yandex.ru', '@gmail.com']
-        for email in emails:
-            if email in value:
-                return value
-        raise ValueError('Это не емейл!')
+        return validate_email(value)
     
     @validates('phone')
     def check_phone(self, key, value:str):
-        if value:
-            if (value.startswith('+7') or value.startswith('8')) and (len(value) == 12 or len(value) == 11):
-                return value
-            raise ValueError("неверный формат номера")
-        return None
+        return validate_phone(value)
+    
+    __table_args__ = (
+        # дублируем validate_email в бд для записей в обход crud
+        CheckConstraint(r"email ~ '@(mail\.ru|yandex\.ru|gmail\.com)$'", name='ck_reader_email_domain'),
+        CheckConstraint( # то же правило, что в validate_phone
+            "phone IS NULL OR ((phone LIKE '+7%' OR phone LIKE '8%') AND length(phone) IN (11, 12))",
+            name='ck_reader_phone_format'
+        ),
+    )
     
     
 class Loan(Base):
     
     __tablename__ = 'loan'
     
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    book_id: Mapped[int] = mapped_column(Integer, ForeignKey('book.id'), nullable=False)
-    reader_id: Mapped[int] = mapped_column(Integer, ForeignKey('reader.id'), nullable=False)
-    loan_date: Mapped[date] = mapped_column(Date, server_default=func.current_date())
-    due_date: Mapped[date] = mapped_column(Date, nullable=False)
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    book_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('book.id'), nullable=False)
+    reader_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('reader.id'), nullable=False)
+    # обе даты по умолчанию считаем в питоне: иначе loan_date брался бы с часов бд, а due_date с часов
+    # приложения, и на стыке суток/часовых поясов срок выходил бы 13 или 15 дней.
+    # server_default - только для вставок мимо SQLAlchemy
+    loan_date: Mapped[date] = mapped_column(Date, default=date.today, server_default=func.current_date())
+    due_date: Mapped[date] = mapped_column(
+        Date,
+        nullable=False,
+        default=_default_due_date,
+        server_default=text(f'(CURRENT_DATE + {LOAN_PERIOD_DAYS})')
+    )
     return_date: Mapped[date] = mapped_column(Date, nullable=True, server_default=None)
     
+    # статус считает бд и отдает вместе со строкой: active / overdue / returned
+    status: Mapped[str] = column_property(
+        case(
+            (return_date.isnot(None), 'returned'),
+            (due_date < func.current_date(), 'overdue'),
+            else_='active'
+        )
+    )
+    
     reader: Mapped['Reader'] = relationship(back_populates='loans')
     book: Mapped['Book'] = relationship(back_populates='loans')
     
-    @hybrid_property
-    def status(self) -> str:
-        try:
-            if self.return_date is None and self.due_date >= date.today():
-                status = 'active'
-            elif self.return_date is None and self.due_date < date.today():
-                status = 'overdue'
-            else:
-                status = 'returned'
-                
-            return status
-            
-        except Exception as e:
-            print('Ошибка!', e)
-            raise
-        
-    
-    @status.expression
-    def status(cls):
-        return case(
-            (cls.return_date.isnot(None), 'returned'),
-            (cls.due_date < func.current_date(), 'overdue'),
-            else_= 'active'          
-        )
-        
     __table_args__ = (Index(
         'id_return_date_idx',
         'book_id',
@@ -150,21 +206,22 @@ class Loan(Base):
         unique=True,
         postgresql_where=text('return_date IS NULL')
     ),
+                      Index( # открытые выдачи по читателю, для поиска должников
+        'ix_loan_open_reader',
+        'reader_id',
+        'due_date',
+        postgresql_where=text('return_date IS NULL')
+    ),
+                      Index( # открытые выдачи по сроку: активные (due_date >= сегодня) и просроченные
+        'ix_loan_open_due',
+        'due_date',
+        postgresql_where=text('return_date IS NULL')
+    ),
+                      # внешние ключи: без индексов Reader.loans/Book.loans и удаление читателя/книги идут полным сканом
+                      Index('ix_loan_reader_id', 'reader_id'),
+                      Index('ix_loan_book_id', 'book_id'),
                       )
 
-    
-@event.listens_for(Loan, 'before_insert')
-def set_due_date(mapper, connection, target):
-    if target.due_date is None:
-        target.due_date = target.loan_date + timedelta(days=14)
-        
-@event.listens_for(Loan, 'after_insert')
-def print_message(mapper, connection, target):
-    if target.reader and target.book:
-        print(f"Книга {target.book.title} выдана читателю {target.reader.full_name}")
-    else:
-        print('Данные не подгружены')
-    
 
 class LoanStatus:
     ACTIVE = 'active'